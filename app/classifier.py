@@ -58,6 +58,7 @@ def classify_event(event_dict):
     На вход:
       {
         'audit_id': str,
+        'host': str,
         'timestamp': datetime,
         'records': { 'SYSCALL': {...}, 'PATH': {...}, ... }
       }
@@ -123,6 +124,7 @@ def classify_event(event_dict):
 
     return {
         "audit_id": event_dict.get("audit_id"),
+        "host": event_dict.get("host"),
         "timestamp": event_dict.get("timestamp"),
         "uid": uid,
         "auid": auid,
@@ -0,0 +1,326 @@
+"""
+Колоночное хранилище для аналитики: каталог parquet-файлов,
+разбитый по дням (day=YYYY-MM-DD/part-<id>.parquet).
+
+Набор полей тот же, что у AuditEvent (включая id), строки копируются
+из SQLite по возрастанию id, поэтому обе базы содержат одни и те же события.
+Строковые поля с малым числом значений хранятся со словарным кодированием.
+Нужен pyarrow.
+"""
+import json
+import os
+import shutil
+
+from sqlalchemy import Boolean, DateTime, Integer, select
+
+from .models import AuditEvent
+from .queries import AGGREGATE_FIELDS, BUCKETS, parse_time
+
+COLUMNAR_DIR = "columnar"
+STATE_FILE = "_state.json"
+PARTITION_COL = "day"
+
+# сколько строк из SQLite в одном parquet-файле
+SYNC_BATCH_SIZE = 100_000
+
+# словарное кодирование (повторяющиеся значения хранятся один раз)
+DICT_COLUMNS = ("host", "exe", "comm", "file_path", "event_type", "classification")
+
+# временные каталоги уплотнения дня (начинаются с "_" — pyarrow их пропускает)
+_NEW_PREFIX = "_new_"
+_OLD_PREFIX = "_old_"
+
+class ColumnarUnavailable(RuntimeError):
+    """Нет pyarrow или хранилище ещё не создано."""
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise ColumnarUnavailable(
+            "Для колоночного хранилища установите pyarrow: pip install pyarrow"
+        )
+    return pa, pc, ds
+
+
+def arrow_schema():
+    """Схема parquet по колонкам AuditEvent."""
+    pa, _, _ = _arrow()
+    fields = []
+    for col in AuditEvent.__table__.columns:
+        if col.name in DICT_COLUMNS:
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        elif isinstance(col.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(col.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(col.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append((col.name, arrow_type))
+    return pa.schema(fields)
+
+
+def _read_state(root):
+    path = os.path.join(root, STATE_FILE)
+    if not os.path.exists(path):
+        return {"last_id": 0, "last_key": None}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _row_key(row):
+    """Ключ дедупликации строки — по нему узнаём ту же самую БД."""
+    return [row.host, row.audit_id, row.file_path]
+
+
+def _same_database(conn, state):
+    """
+    Та ли это audit.db, из которой копировали раньше: строка с id = last_id
+    должна существовать и иметь тот же ключ. После пересоздания audit.db
+    (новые id начинаются с 1) проверка не проходит.
+    """
+    if not state["last_id"]:
+        return True
+    events = AuditEvent.__table__
+    row = conn.execute(select(events).where(events.c.id == state["last_id"])).first()
+    return row is not None and _row_key(row) == state.get("last_key")
+
+
+def _clear_partitions(root):
+    """Удалить parquet-данные (каталоги day=... и остатки уплотнения), не трогая прочее."""
+    for name in os.listdir(root):
+        if name.startswith((PARTITION_COL + "=", _NEW_PREFIX, _OLD_PREFIX)):
+            shutil.rmtree(os.path.join(root, name))
+
+
+def _first_id(name):
+    """part-<первый id>-<n>.parquet -> первый id (для сортировки файлов по id)."""
+    return int(name.split("-")[1])
+
+
+def _recover_compaction(root):
+    """
+    Довести до конца уплотнение, прерванное сбоем (см. _compact_day):
+    _new_day=X без day=X — сбой между переименованиями, новый каталог и есть данные;
+    если day=X на месте — замена не начиналась или уже сделана, остатки удаляем.
+    """
+    for name in sorted(os.listdir(root)):
+        if name.startswith(_NEW_PREFIX):
+            target = os.path.join(root, name[len(_NEW_PREFIX):])
+            if os.path.exists(target):
+                shutil.rmtree(os.path.join(root, name))
+            else:
+                os.rename(os.path.join(root, name), target)
+    for name in os.listdir(root):
+        if name.startswith(_OLD_PREFIX):
+            shutil.rmtree(os.path.join(root, name))
+
+
+def _compact_day(root, day):
+    """
+    Переписать каталог day=<day> одним parquet-файлом (строки по возрастанию id).
+    Каждый импорт добавляет в затронутые дни по файлу, и без уплотнения
+    хранилище со временем состоит из тысяч мелких файлов.
+    Новый каталог собирается рядом под именем с "_" (pyarrow такие не читает)
+    и подменяет старый двумя переименованиями.
+    """
+    pa, _, _ = _arrow()
+    import pyarrow.parquet as pq
+
+    name = f"{PARTITION_COL}={day}"
+    path = os.path.join(root, name)
+    files = sorted(
+        (f for f in os.listdir(path) if f.startswith("part-") and f.endswith(".parquet")),
+        key=_first_id,
+    )
+    if len(files) < 2:
+        return
+
+    table = pa.concat_tables(pq.ParquetFile(os.path.join(path, f)).read() for f in files)
+    new, old = os.path.join(root, _NEW_PREFIX + name), os.path.join(root, _OLD_PREFIX + name)
+    shutil.rmtree(new, ignore_errors=True)
+    os.makedirs(new)
+    # имя как у первой пачки: следующие пачки начинаются с большего id и его не перезапишут
+    pq.write_table(table, os.path.join(new, files[0]))
+
+    os.rename(path, old)
+    os.rename(new, path)
+    shutil.rmtree(old)
+
+
+def _write_state(root, state):
+    path = os.path.join(root, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def sync_columnar(engine, root=COLUMNAR_DIR):
+    """
+    Дописать в колоночное хранилище события из SQLite с id больше сохранённого.
+    Имя файла зависит от первого id пачки, поэтому повторный запуск после
+    сбоя перезаписывает те же файлы, а не дублирует строки.
+    Если audit.db была пересоздана, хранилище строится заново.
+    В конце каждый затронутый день уплотняется в один файл.
+    Возвращает число скопированных событий.
+    """
+    pa, pc, ds = _arrow()
+    os.makedirs(root, exist_ok=True)
+
+    schema = arrow_schema()
+    state = _read_state(root)
+    events = AuditEvent.__table__
+
+    _recover_compaction(root)
+    copied = 0
+    touched = set()
+    with engine.connect() as conn:
+        if not _same_database(conn, state):
+            _clear_partitions(root)
+            state = {"last_id": 0, "last_key": None}
+            _write_state(root, state)
+
+        stmt = select(events).where(events.c.id > state["last_id"]).order_by(events.c.id)
+        result = conn.execution_options(
+            stream_results=True, yield_per=SYNC_BATCH_SIZE
+        ).execute(stmt)
+        for rows in result.partitions():
+            columns = [list(col) for col in zip(*rows)]
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=pa.string()).dictionary_encode()
+                 if field.name in DICT_COLUMNS
+                 else pa.array(values, type=field.type)
+                 for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+            day = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+            table = table.append_column(PARTITION_COL, day)
+            touched.update(pc.unique(day).to_pylist())
+
+            ds.write_dataset(
+                table, root,
+                format="parquet",
+                partitioning=[PARTITION_COL],
+                partitioning_flavor="hive",
+                basename_template=f"part-{rows[0].id}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+
+            state["last_id"] = rows[-1].id
+            state["last_key"] = _row_key(rows[-1])
+            _write_state(root, state)
+            copied += len(rows)
+
+    for day in sorted(touched):
+        _compact_day(root, day)
+    return copied
+
+
+def _filter_expression(ds, classification=None, event_type=None, uid=None,
+                       host=None, since=None, until=None):
+    """Те же фильтры, что у queries.apply_filters, в виде выражения pyarrow."""
+    field = ds.field
+    conditions = []
+    if classification:
+        conditions.append(field("classification") == classification)
+    if uid:
+        conditions.append(field("uid") == uid)
+    if event_type:
+        conditions.append(field("event_type") == event_type)
+    if host:
+        conditions.append(field("host") == host)
+    if since:
+        since = parse_time(since)
+        conditions.append(field("timestamp") >= since)
+        # отсечение целых каталогов day=... до чтения файлов
+        conditions.append(field(PARTITION_COL) >= since.strftime("%Y-%m-%d"))
+    if until:
+        until = parse_time(until)
+        conditions.append(field("timestamp") < until)
+        conditions.append(field(PARTITION_COL) <= until.strftime("%Y-%m-%d"))
+
+    expr = None
+    for cond in conditions:
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def aggregate_columnar(by, bucket=None, root=COLUMNAR_DIR, limit=None, **filters):
+    """
+    Аналог queries.build_aggregate_query для колоночного хранилища:
+    число событий по полям `by` (и по шагу времени bucket).
+    limit — как в build_aggregate_query (с bucket — топ-N в каждом шаге).
+    Возвращает (columns, rows) — имена колонок и список кортежей.
+    """
+    pa, pc, ds = _arrow()
+
+    if not by and not bucket:
+        raise ValueError("укажите поля группировки или шаг времени")
+    for name in by:
+        if name not in AGGREGATE_FIELDS:
+            raise ValueError(f"группировка по полю {name!r} не поддерживается")
+
+    if not os.path.isdir(root):
+        raise ColumnarUnavailable(
+            f"Колоночное хранилище {root} не найдено: "
+            f"выполните import_events.py --columnar {root}"
+        )
+
+    partition_schema = pa.schema([(PARTITION_COL, pa.string())])
+    partitioning = ds.partitioning(partition_schema, flavor="hive")
+    # схема задаётся явно: в пустом хранилище (ещё нет parquet-файлов)
+    # pyarrow иначе не знает ни одной колонки, кроме day
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning,
+                         schema=pa.unify_schemas([arrow_schema(), partition_schema]),
+                         exclude_invalid_files=True)
+    needed = list(by) + (["timestamp"] if bucket else [])
+    try:
+        table = dataset.to_table(columns=needed, filter=_filter_expression(ds, **filters))
+    except pa.ArrowException as exc:
+        # повреждённые или несовместимые файлы — не падаем, а сообщаем
+        raise ColumnarUnavailable(f"Ошибка чтения колоночного хранилища {root}: {exc}")
+
+    keys = []
+    arrays = []
+    if bucket:
+        keys.append("bucket")
+        arrays.append(pc.strftime(table["timestamp"], format=BUCKETS[bucket]))
+    for name in by:
+        keys.append(name)
+        col = table[name]
+        if pa.types.is_dictionary(col.type):
+            col = col.cast(pa.string())
+        arrays.append(col)
+
+    # count по первому ключу с mode="all" — считаются и строки с NULL
+    count_col = f"{keys[0]}_count"
+    grouped = (
+        pa.table(arrays, names=keys)
+        .group_by(keys)
+        .aggregate([(keys[0], "count", pc.CountOptions(mode="all"))])
+    )
+
+    sort_keys = [(count_col, "descending")]
+    if bucket:
+        sort_keys.insert(0, ("bucket", "ascending"))
+    grouped = grouped.sort_by(sort_keys)
+    if limit and not bucket:
+        grouped = grouped.slice(0, limit)
+
+    rows = list(zip(*(grouped[c].to_pylist() for c in keys + [count_col])))
+    if limit and bucket:
+        # топ-N внутри каждого шага (строки уже отсортированы по шагу и количеству)
+        taken = {}
+        top = []
+        for row in rows:
+            taken[row[0]] = taken.get(row[0], 0) + 1
+            if taken[row[0]] <= limit:
+                top.append(row)
+        rows = top
+    return keys + ["count"], rows
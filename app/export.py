@@ -0,0 +1,106 @@
+import csv
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Integer
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+
+class CsvWriter:
+    def __init__(self, out, columns):
+        self.out = out
+        self.writer = csv.writer(out)
+        self.writer.writerow(columns)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.out.flush()
+
+    def close(self):
+        self.out.flush()
+
+
+class JsonlWriter:
+    def __init__(self, out, columns):
+        self.out = out
+        self.columns = columns
+
+    def write(self, rows):
+        for row in rows:
+            record = dict(zip(self.columns, row))
+            self.out.write(json.dumps(record, ensure_ascii=False, default=_json_value) + "\n")
+        self.out.flush()
+
+    def close(self):
+        self.out.flush()
+
+
+def _json_value(value):
+    """datetime -> ISO 8601 ("2024-05-29T15:20:14"), прочее — строкой."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class ParquetWriter:
+    """Запись пачками в один parquet-файл (нужен pyarrow)."""
+
+    def __init__(self, path, columns, types):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Для формата parquet установите pyarrow: pip install pyarrow")
+
+        self.pa = pa
+        self.columns = columns
+        self.schema = pa.schema([
+            (name, _arrow_type(pa, sql_type)) for name, sql_type in zip(columns, types)
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        if not rows:
+            return
+        data = [list(col) for col in zip(*rows)]
+        self.writer.write_table(self.pa.Table.from_arrays(data, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _arrow_type(pa, sql_type):
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def open_stmt_writer(fmt, output, stmt):
+    """open_writer с колонками и типами из select(...)."""
+    columns = [c.name for c in stmt.selected_columns]
+    types = [c.type for c in stmt.selected_columns]
+    return open_writer(fmt, output, columns, types)
+
+
+def open_writer(fmt, output, columns, types=None):
+    """
+    Писатель строк с колонками columns в формате fmt.
+    types — SQLAlchemy-типы колонок (для схемы parquet; по умолчанию строки).
+    output — путь к файлу или "-" (stdout; для parquet не подходит).
+    Возвращает (writer, file) — file нужно закрыть после writer.close(), если это не stdout.
+    """
+    if fmt == "parquet":
+        if output == "-":
+            raise SystemExit("Для parquet укажите файл: -o events.parquet")
+        types = types or [None] * len(columns)
+        return ParquetWriter(output, columns, types), None
+
+    out = sys.stdout if output == "-" else open(output, "w", newline="", encoding="utf-8")
+    writer_cls = CsvWriter if fmt == "csv" else JsonlWriter
+    return writer_cls(out, columns), (None if out is sys.stdout else out)
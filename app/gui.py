@@ -1,9 +1,11 @@
+import os
+
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QComboBox, QPushButton, QTableWidget, QTableWidgetItem,
-    QAbstractItemView, QLineEdit, QMessageBox, QHeaderView, QSplitter
+    QAbstractItemView, QLineEdit, QMessageBox, QHeaderView, QSplitter, QCheckBox
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QColor, QPen
 
 from PyQt6.QtCharts import (
@@ -15,6 +17,15 @@ from sqlalchemy import create_engine, select
 from sqlalchemy.orm import Session
 
 from .models import Base, AuditEvent
+from .columnar import ColumnarUnavailable, aggregate_columnar
+from .logindex import LogIndex, LOG_INDEX_DB
+from .queries import apply_filters
+from .search import apply_ranking, apply_search, id_column
+
+# строк на одной странице таблицы
+PAGE_SIZE = 1000
+# задержка перед поиском после ввода (мс)
+SEARCH_DEBOUNCE_MS = 300
 
 
 class MainWindow(QMainWindow):
@@ -123,19 +134,65 @@ class MainWindow(QMainWindow):
         self.uid_edit.setFixedWidth(170)
         controls_layout.addWidget(self.uid_edit)
 
+        # Фильтр по хосту (список хостов берётся из БД)
+        controls_layout.addSpacing(15)
+        controls_layout.addWidget(QLabel("Хост:"))
+        self.host_combo = QComboBox()
+        self.host_combo.setMinimumWidth(140)
+        controls_layout.addWidget(self.host_combo)
+
+        # Полнотекстовый поиск по exe / comm / файлу / key / reason (FTS5)
+        controls_layout.addSpacing(15)
+        controls_layout.addWidget(QLabel("Поиск:"))
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("python3 | nc | vim, pyth*, /etc/shadow ...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMinimumWidth(220)
+        controls_layout.addWidget(self.search_edit)
+
+        # по умолчанию результаты поиска — новые сверху (быстро на любом объёме);
+        # bm25 — по желанию, только среди RANK_CANDIDATES самых новых совпадений
+        self.ranked_check = QCheckBox("По релевантности")
+        controls_layout.addWidget(self.ranked_check)
+
         controls_layout.addStretch()
+
+        # Пагинация: keyset по id — для каждой страницы помним id, с которого она начинается
+        self.page = 0
+        self.page_starts = [None]
+        self.last_page_id = None
+        self.prev_button = QPushButton("<")
+        self.next_button = QPushButton(">")
+        self.page_label = QLabel("Стр. 1")
+        controls_layout.addWidget(self.prev_button)
+        controls_layout.addWidget(self.page_label)
+        controls_layout.addWidget(self.next_button)
+
+        # Источник данных для графиков
+        controls_layout.addSpacing(15)
+        controls_layout.addWidget(QLabel("Графики:"))
+        self.chart_source_combo = QComboBox()
+        self.chart_source_combo.addItem("Текущая страница", userData="page")
+        self.chart_source_combo.addItem("Колоночное хранилище", userData="columnar")
+        controls_layout.addWidget(self.chart_source_combo)
+
         self.refresh_button = QPushButton("Обновить")
         controls_layout.addWidget(self.refresh_button)
 
+        # поиск запускается не на каждый символ, а после паузы во вводе
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+
         # --- Основная область: таблица + графики ---
         splitter = QSplitter(Qt.Orientation.Horizontal)
         main_layout.addWidget(splitter)
 
         # Левая часть — таблица
         self.table = QTableWidget()
-        self.table.setColumnCount(9)
+        self.table.setColumnCount(10)
         self.table.setHorizontalHeaderLabels(
-            ["ID", "Время", "UID", "AUID",
+            ["ID", "Хост", "Время", "UID", "AUID",
              "Процесс", "Файл", "Тип", "Уровень", "Классификация"]
         )
         self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
@@ -163,33 +220,104 @@ class MainWindow(QMainWindow):
         splitter.setSizes([900, 500])
 
         # --- Сигналы ---
-        self.refresh_button.clicked.connect(self.load_data)
-        self.filter_combo.currentIndexChanged.connect(self.load_data)
-        self.type_combo.currentIndexChanged.connect(self.load_data)
-        self.uid_edit.returnPressed.connect(self.load_data)
+        self.refresh_button.clicked.connect(self.refresh)
+        self.filter_combo.currentIndexChanged.connect(self.reload_first_page)
+        self.type_combo.currentIndexChanged.connect(self.reload_first_page)
+        self.host_combo.currentIndexChanged.connect(self.reload_first_page)
+        self.chart_source_combo.currentIndexChanged.connect(self.load_data)
+        self.uid_edit.returnPressed.connect(self.reload_first_page)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+        self.search_edit.returnPressed.connect(self.reload_first_page)
+        self.search_timer.timeout.connect(self.reload_first_page)
+        self.ranked_check.toggled.connect(self.reload_first_page)
+        self.prev_button.clicked.connect(self.prev_page)
+        self.next_button.clicked.connect(self.next_page)
         self.table.cellDoubleClicked.connect(self.show_details)
 
         # Первая загрузка
-        self.load_data()
+        self.refresh()
 
     # ------------------------ ЛОГИКА ------------------------
 
+    def refresh(self):
+        """Перечитать список хостов и события."""
+        self.load_hosts()
+        self.load_data()
+
+    def reload_first_page(self):
+        """Фильтры изменились — показать первую страницу."""
+        self.search_timer.stop()
+        self.page = 0
+        self.page_starts = [None]
+        self.load_data()
+
+    def prev_page(self):
+        if self.page > 0:
+            self.page -= 1
+            self.load_data()
+
+    def next_page(self):
+        # следующая страница — события с id меньше последнего на текущей
+        del self.page_starts[self.page + 1:]
+        self.page_starts.append(self.last_page_id)
+        self.page += 1
+        self.load_data()
+
+    def load_hosts(self):
+        """Заполнить фильтр хостов (DISTINCT по индексу host), сохранив выбор."""
+        current = self.host_combo.currentData()
+
+        with Session(self.engine) as session:
+            stmt = select(AuditEvent.host).distinct().order_by(AuditEvent.host)
+            hosts = session.scalars(stmt).all()
+
+        self.host_combo.blockSignals(True)
+        self.host_combo.clear()
+        self.host_combo.addItem("Все хосты", userData=None)
+        for host in hosts:
+            self.host_combo.addItem(host, userData=host)
+        idx = self.host_combo.findData(current)
+        self.host_combo.setCurrentIndex(idx if idx >= 0 else 0)
+        self.host_combo.blockSignals(False)
+
     def load_data(self):
         """Загрузка событий в таблицу + обновление KPI и графиков."""
         classification = self.filter_combo.currentData()
         uid_filter = self.uid_edit.text().strip() or None
         event_type_filter = self.type_combo.currentData()
+        host_filter = self.host_combo.currentData()
+        search_text = self.search_edit.text().strip()
+
+        filters = {
+            "classification": classification,
+            "event_type": event_type_filter,
+            "uid": uid_filter,
+            "host": host_filter,
+        }
 
         with Session(self.engine) as session:
-            stmt = select(AuditEvent).order_by(AuditEvent.id.desc()).limit(1000)
-            if classification:
-                stmt = stmt.where(AuditEvent.classification == classification)
-            if uid_filter:
-                stmt = stmt.where(AuditEvent.uid == uid_filter)
-            if event_type_filter:
-                stmt = stmt.where(AuditEvent.event_type == event_type_filter)
+            stmt = apply_filters(select(AuditEvent), **filters)
+
+            stmt, searching = apply_search(stmt, search_text)
+            if searching and self.ranked_check.isChecked():
+                # окно кандидатов ограничено, поэтому OFFSET здесь дешёвый
+                stmt = apply_ranking(stmt, search_text)
+                stmt = stmt.limit(PAGE_SIZE).offset(self.page * PAGE_SIZE)
+            else:
+                # новые сверху, страницы — по WHERE id < ... (без OFFSET)
+                id_col = id_column(searching)
+                before_id = self.page_starts[self.page]
+                if before_id is not None:
+                    stmt = stmt.where(id_col < before_id)
+                stmt = stmt.order_by(id_col.desc()).limit(PAGE_SIZE)
             events = session.scalars(stmt).all()
 
+        self.last_page_id = events[-1].id if events else None
+
+        self.page_label.setText(f"Стр. {self.page + 1}")
+        self.prev_button.setEnabled(self.page > 0)
+        self.next_button.setEnabled(len(events) == PAGE_SIZE)
+
         self.table.setRowCount(len(events))
 
         total = len(events)
@@ -211,14 +339,15 @@ class MainWindow(QMainWindow):
                     crit_count += 1
 
             self.table.setItem(row, 0, QTableWidgetItem(str(e.id)))
-            self.table.setItem(row, 1, QTableWidgetItem(str(e.timestamp)))
-            self.table.setItem(row, 2, QTableWidgetItem(str(e.uid or "")))
-            self.table.setItem(row, 3, QTableWidgetItem(str(e.auid or "")))
-            self.table.setItem(row, 4, QTableWidgetItem(str(e.exe or "")))
-            self.table.setItem(row, 5, QTableWidgetItem(str(e.file_path or "")))
-            self.table.setItem(row, 6, QTableWidgetItem(str(e.event_type or "")))
-            self.table.setItem(row, 7, QTableWidgetItem(level))
-            self.table.setItem(row, 8, QTableWidgetItem(str(e.classification or "")))
+            self.table.setItem(row, 1, QTableWidgetItem(str(e.host or "")))
+            self.table.setItem(row, 2, QTableWidgetItem(str(e.timestamp)))
+            self.table.setItem(row, 3, QTableWidgetItem(str(e.uid or "")))
+            self.table.setItem(row, 4, QTableWidgetItem(str(e.auid or "")))
+            self.table.setItem(row, 5, QTableWidgetItem(str(e.exe or "")))
+            self.table.setItem(row, 6, QTableWidgetItem(str(e.file_path or "")))
+            self.table.setItem(row, 7, QTableWidgetItem(str(e.event_type or "")))
+            self.table.setItem(row, 8, QTableWidgetItem(level))
+            self.table.setItem(row, 9, QTableWidgetItem(str(e.classification or "")))
 
             # Цвет по уровню — тёмные оттенки
             if level == "CRITICAL":
@@ -241,7 +370,31 @@ class MainWindow(QMainWindow):
         self.kpi_crit.setText(f"Критичных: {crit_count}")
 
         # Графики
-        self.update_charts(events)
+        self.update_chart_source(searching)
+        if self.chart_source_combo.currentData() == "columnar":
+            self.update_charts_columnar(filters, events)
+        else:
+            self.update_charts(events)
+
+    def set_chart_source(self, index):
+        """Переключить источник графиков без повторного вызова load_data."""
+        self.chart_source_combo.blockSignals(True)
+        self.chart_source_combo.setCurrentIndex(index)
+        self.chart_source_combo.blockSignals(False)
+
+    def update_chart_source(self, searching):
+        """
+        Колоночное хранилище не знает о полнотекстовом поиске (FTS есть только
+        в SQLite), поэтому при активном поиске графики строятся по таблице.
+        """
+        item = self.chart_source_combo.model().item(1)
+        item.setEnabled(not searching)
+        if searching:
+            item.setToolTip("Недоступно при поиске: колоночное хранилище не учитывает поиск")
+            if self.chart_source_combo.currentData() == "columnar":
+                self.set_chart_source(0)
+        else:
+            item.setToolTip("")
 
     def update_charts(self, events):
         """Обновить time-series и pie-chart по событиям (ось X = индекс события)."""
@@ -259,6 +412,73 @@ class MainWindow(QMainWindow):
                 else:
                     warn += 1
 
+        # --- Time-series: индекс события по X, накопленное количество по Y ---
+        total_points = []
+        susp_points = []
+        total_cnt = 0
+        susp_cnt = 0
+
+        events_sorted = sorted(events, key=lambda e: e.timestamp or 0)
+
+        for idx, e in enumerate(events_sorted, start=1):
+            x = float(idx)       # просто номер события
+            total_cnt += 1
+            total_points.append((x, float(total_cnt)))
+            if e.classification == "suspicious":
+                susp_cnt += 1
+                susp_points.append((x, float(susp_cnt)))
+
+        self.draw_charts(normal, warn, crit, total_points, susp_points,
+                         "Номер события (по времени)")
+
+    def update_charts_columnar(self, filters, events):
+        """
+        Графики по агрегатам из колоночного хранилища (все события, а не страница).
+        Ось X = номер дня, Y = накопленное количество событий.
+        Если хранилище недоступно — графики по текущей странице events.
+        """
+        try:
+            _, level_rows = aggregate_columnar(["classification", "perm"], **filters)
+            _, day_rows = aggregate_columnar(["classification"], bucket="day", **filters)
+        except ColumnarUnavailable as exc:
+            QMessageBox.warning(self, "Колоночное хранилище", str(exc))
+            self.set_chart_source(0)
+            self.update_charts(events)
+            return
+
+        normal = warn = crit = 0
+        for classification, perm, count in level_rows:
+            if classification != "suspicious":
+                normal += count
+            elif perm and "w" in perm:
+                crit += count
+            else:
+                warn += count
+
+        per_day = {}
+        for day, classification, count in day_rows:
+            total, susp = per_day.get(day, (0, 0))
+            if classification == "suspicious":
+                susp += count
+            per_day[day] = (total + count, susp)
+
+        total_points = []
+        susp_points = []
+        total_cnt = 0
+        susp_cnt = 0
+        for idx, day in enumerate(sorted(per_day), start=1):
+            total, susp = per_day[day]
+            total_cnt += total
+            susp_cnt += susp
+            total_points.append((float(idx), float(total_cnt)))
+            susp_points.append((float(idx), float(susp_cnt)))
+
+        days = sorted(per_day)
+        x_title = f"Номер дня ({days[0]} — {days[-1]})" if days else "Номер дня"
+        self.draw_charts(normal, warn, crit, total_points, susp_points, x_title)
+
+    def draw_charts(self, normal, warn, crit, total_points, susp_points, x_title):
+        """Отрисовка pie-chart по уровням и линий накопленного количества."""
         pie_series = QPieSeries()
         if normal:
             pie_series.append("Normal", normal)
@@ -281,7 +501,7 @@ class MainWindow(QMainWindow):
         self.pie_chart_view.setChart(pie_chart)
         self.pie_chart_view.setStyleSheet("background-color: #13151a;")
 
-        # --- Time-series: индекс события по X, накопленное количество по Y ---
+        # --- Time-series: накопленное количество по Y ---
         total_series = QLineSeries()
         susp_series = QLineSeries()
 
@@ -299,18 +519,10 @@ class MainWindow(QMainWindow):
         total_series.setPointsVisible(True)
         susp_series.setPointsVisible(True)
 
-        total_cnt = 0
-        susp_cnt = 0
-
-        events_sorted = sorted(events, key=lambda e: e.timestamp or 0)
-
-        for idx, e in enumerate(events_sorted, start=1):
-            x = float(idx)       # просто номер события
-            total_cnt += 1
-            total_series.append(x, float(total_cnt))
-            if e.classification == "suspicious":
-                susp_cnt += 1
-                susp_series.append(x, float(susp_cnt))
+        for x, y in total_points:
+            total_series.append(x, y)
+        for x, y in susp_points:
+            susp_series.append(x, y)
 
         time_chart = QChart()
         time_chart.setTitle("Динамика событий (зелёный — все, красный — suspicious)")
@@ -321,11 +533,11 @@ class MainWindow(QMainWindow):
         time_chart.addSeries(total_series)
         time_chart.addSeries(susp_series)
 
-        max_x = max(1, len(events_sorted))
-        max_y = max(1, total_cnt, susp_cnt)
+        max_x = max(1, len(total_points))
+        max_y = max([1.0] + [y for _, y in total_points] + [y for _, y in susp_points])
 
         axis_x = QValueAxis()
-        axis_x.setTitleText("Номер события (по времени)")
+        axis_x.setTitleText(x_title)
         axis_x.setLabelsColor(QColor("#e5e7eb"))
         axis_x.setRange(1.0, float(max_x))
 
@@ -345,6 +557,15 @@ class MainWindow(QMainWindow):
         self.time_chart_view.setChart(time_chart)
         self.time_chart_view.setStyleSheet("background-color: #13151a;")
 
+    def load_raw_lines(self, e):
+        """Сырые строки audit.log для события (пусто, если индекса нет или файл ротирован)."""
+        if not os.path.exists(LOG_INDEX_DB):
+            return []
+        try:
+            return LogIndex(LOG_INDEX_DB).find_event_lines(e.audit_id, host=e.host)
+        except OSError:
+            return []
+
     def show_details(self, row, column):
         """Подробности события по двойному клику."""
         item = self.table.item(row, 0)
@@ -361,6 +582,7 @@ class MainWindow(QMainWindow):
 
         text = (
             f"ID: {e.id}\n"
+            f"Хост: {e.host}\n"
             f"Время: {e.timestamp}\n"
             f"UID: {e.uid}\n"
             f"AUID: {e.auid}\n"
@@ -380,6 +602,11 @@ class MainWindow(QMainWindow):
         msg.setWindowTitle("Подробности события")
         msg.setIcon(QMessageBox.Icon.Information)
         msg.setText(text)
+
+        # исходные строки журнала — через индекс смещений, без чтения всего лога
+        raw_lines = self.load_raw_lines(e)
+        if raw_lines:
+            msg.setDetailedText("\n".join(raw_lines))
         msg.setStandardButtons(QMessageBox.StandardButton.Ok)
 
         msg.setStyleSheet("""
@@ -0,0 +1,286 @@
+"""
+Разреженный индекс по сырым логам auditd (отдельная SQLite-база рядом с audit.db).
+
+Файл лога делится на блоки по ~BLOCK_SIZE байт (по границам строк);
+для каждого блока хранится смещение, длина и диапазоны
+(секунда эпохи, серийный номер) из audit(<сек>.<мс>:<serial>).
+По ним parse_range / find_event_lines читают только нужные блоки,
+а не весь журнал.
+
+Файлы опознаются по отпечатку (хост + первая строка), а не по имени, поэтому
+после ротации (audit.log -> audit.log.1) индекс остаётся действительным —
+если журналы импортируются с тем же хостом (каталог /var/log/audit всегда
+получает один хост, см. parser.find_log_sources). Для растущего audit.log
+при следующем импорте индексируется только дописанный хвост.
+"""
+import hashlib
+import os
+import socket
+
+from sqlalchemy import Column, Integer, String, ForeignKey, create_engine, select, delete
+from sqlalchemy.orm import Session, declarative_base
+
+from .parser import parse_line, group_records
+from .queries import parse_time
+
+LOG_INDEX_DB = "audit_logidx.db"
+
+# примерный размер блока индекса в байтах
+BLOCK_SIZE = 64 * 1024
+
+IndexBase = declarative_base()
+
+
+class LogFile(IndexBase):
+    __tablename__ = "log_files"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fingerprint = Column(String, unique=True)  # sha1 хоста и первой строки файла
+    path = Column(String)                      # последний известный путь
+    host = Column(String)                      # хост для строк без node=
+    indexed_size = Column(Integer, default=0)  # до какого байта файл проиндексирован
+
+
+class LogBlock(IndexBase):
+    __tablename__ = "log_blocks"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    file_id = Column(Integer, ForeignKey("log_files.id"), index=True)
+    offset = Column(Integer)
+    length = Column(Integer)
+    min_ts = Column(Integer, index=True)   # секунды эпохи
+    max_ts = Column(Integer)
+    min_serial = Column(Integer)
+    max_serial = Column(Integer)
+
+
+def file_fingerprint(path, host=None):
+    """
+    sha1 хоста и первой строки файла (None, если файл пустой).
+    Хост учитывается, чтобы одинаково начинающиеся логи разных машин не совпали.
+    """
+    with open(path, "rb") as f:
+        return stream_fingerprint(f, host)
+
+
+def stream_fingerprint(f, host=None):
+    """file_fingerprint для открытого файла; позиция возвращается в начало."""
+    host = host or socket.gethostname()
+    f.seek(0)
+    first = f.readline(4096)
+    f.seek(0)
+    if not first:
+        return None
+    return hashlib.sha1(host.encode("utf-8") + b"\n" + first).hexdigest()
+
+
+def _split_audit_id(audit_id):
+    sec, serial = audit_id.split(":")
+    return int(sec), int(serial)
+
+
+def _epoch(value):
+    """datetime / строка (как --since, в т.ч. "1716996900") / число -> секунды эпохи."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = parse_time(value)
+    return int(value.timestamp())
+
+
+class BlockIndexer:
+    """
+    Сборщик блоков во время разбора файла (on_record для parse_log_file).
+    Индексирует только строки начиная с байта start_offset
+    и только целые строки (недописанный хвост попадёт в следующий импорт).
+    """
+
+    def __init__(self, start_offset=0, block_size=BLOCK_SIZE):
+        self.start_offset = start_offset
+        self.block_size = block_size
+        self.blocks = []
+        self.indexed_size = start_offset
+        self._current = None
+
+    def __call__(self, offset, raw, rec):
+        if offset < self.start_offset or not raw.endswith(b"\n"):
+            return
+
+        sec, serial = _split_audit_id(rec["audit_id"])
+        end = offset + len(raw)
+        block = self._current
+
+        if block is None or end - block["offset"] > self.block_size:
+            self._flush()
+            block = self._current = {
+                "offset": offset, "length": 0,
+                "min_ts": sec, "max_ts": sec,
+                "min_serial": serial, "max_serial": serial,
+            }
+
+        block["length"] = end - block["offset"]
+        block["min_ts"] = min(block["min_ts"], sec)
+        block["max_ts"] = max(block["max_ts"], sec)
+        block["min_serial"] = min(block["min_serial"], serial)
+        block["max_serial"] = max(block["max_serial"], serial)
+        self.indexed_size = end
+
+    def _flush(self):
+        if self._current is not None:
+            self.blocks.append(self._current)
+            self._current = None
+
+    def finish(self):
+        """Закрыть последний блок; возвращает (blocks, indexed_size)."""
+        self._flush()
+        return self.blocks, self.indexed_size
+
+
+class LogIndex:
+    def __init__(self, db_path=LOG_INDEX_DB):
+        self.engine = create_engine(f"sqlite:///{db_path}")
+        IndexBase.metadata.create_all(self.engine)
+
+    # ------------------------ построение ------------------------
+
+    def resume_point(self, path, host=None):
+        """
+        Отпечаток файла и байт, с которого продолжать его индексацию
+        (0 — новый или изменённый файл).
+        Файл могут ротировать до того, как его откроют для разбора, поэтому
+        разбирающий код сверяет отпечаток с открытым файлом (import_events.load_source)
+        и передаёт в add_blocks отпечаток того файла, который действительно прочитан.
+        """
+        fingerprint = file_fingerprint(path, host)
+        if fingerprint is None:
+            return None, 0
+
+        with Session(self.engine) as session:
+            log_file = session.scalars(
+                select(LogFile).where(LogFile.fingerprint == fingerprint)
+            ).first()
+            if log_file is None:
+                return fingerprint, 0
+
+            # файл стал короче проиндексированного — строим индекс заново
+            if os.path.getsize(path) < log_file.indexed_size:
+                session.execute(delete(LogBlock).where(LogBlock.file_id == log_file.id))
+                log_file.indexed_size = 0
+                session.commit()
+            return fingerprint, log_file.indexed_size
+
+    def add_blocks(self, fingerprint, path, host, blocks, indexed_size):
+        """
+        Сохранить блоки, собранные BlockIndexer для файла с отпечатком fingerprint.
+        path — где этот файл сейчас; None, если неизвестно (файл переименовали
+        во время разбора) — тогда путь обновит следующий импорт.
+        """
+        if fingerprint is None:
+            return
+        host = host or socket.gethostname()
+
+        with Session(self.engine) as session:
+            log_file = session.scalars(
+                select(LogFile).where(LogFile.fingerprint == fingerprint)
+            ).first()
+            if log_file is None:
+                log_file = LogFile(fingerprint=fingerprint, host=host, indexed_size=0)
+                session.add(log_file)
+                session.flush()
+
+            # после ротации путь меняется, отпечаток — нет
+            if path:
+                log_file.path = os.path.abspath(path)
+            log_file.host = host
+
+            for block in blocks:
+                # защита от повторного добавления уже проиндексированного
+                if block["offset"] < log_file.indexed_size:
+                    continue
+                session.add(LogBlock(file_id=log_file.id, **block))
+
+            log_file.indexed_size = max(log_file.indexed_size, indexed_size)
+            session.commit()
+
+    # ------------------------ чтение ------------------------
+
+    def _iter_records(self, conditions, host=None):
+        """
+        Строки из блоков, подходящих под conditions.
+        Возвращает пары (raw_line: str, rec) с уже подставленным хостом.
+        """
+        with Session(self.engine) as session:
+            stmt = (
+                select(LogFile, LogBlock)
+                .join(LogBlock, LogBlock.file_id == LogFile.id)
+                .where(*conditions)
+                .order_by(LogFile.id, LogBlock.offset)
+            )
+            rows = session.execute(stmt).all()
+
+        # соседние блоки одного файла читаем одним куском
+        ranges = []
+        for log_file, block in rows:
+            last = ranges[-1] if ranges else None
+            if last and last[0] is log_file and last[1] + last[2] == block.offset:
+                last[2] += block.length
+            else:
+                ranges.append([log_file, block.offset, block.length])
+
+        checked = {}
+        for log_file, offset, length in ranges:
+            if log_file.id not in checked:
+                # файл мог быть удалён или заменён другим с тем же именем
+                checked[log_file.id] = bool(
+                    log_file.path and os.path.exists(log_file.path)
+                    and file_fingerprint(log_file.path, log_file.host) == log_file.fingerprint
+                )
+            if not checked[log_file.id]:
+                continue
+
+            with open(log_file.path, "rb") as f:
+                f.seek(offset)
+                chunk = f.read(length)
+
+            for raw in chunk.splitlines():
+                line = raw.decode("utf-8", errors="ignore")
+                rec = parse_line(line)
+                if not rec:
+                    continue
+                rec["host"] = rec["host"] or log_file.host
+                if host and rec["host"] != host:
+                    continue
+                yield line, rec
+
+    def iter_range_lines(self, start, end, host=None):
+        """Сырые строки с временем start <= t < end (datetime, строка или секунды)."""
+        start_sec, end_sec = _epoch(start), _epoch(end)
+        conditions = [LogBlock.min_ts < end_sec, LogBlock.max_ts >= start_sec]
+        for line, rec in self._iter_records(conditions, host=host):
+            sec, _ = _split_audit_id(rec["audit_id"])
+            if start_sec <= sec < end_sec:
+                yield line, rec
+
+    def parse_range(self, start, end, host=None):
+        """
+        Аналог parse_log_file для интервала времени: события (в том же формате),
+        собранные только из блоков, пересекающих [start, end).
+        """
+        records = (rec for _, rec in self.iter_range_lines(start, end, host=host))
+        return group_records(records)
+
+    def find_event_lines(self, audit_id, host=None):
+        """Исходные строки журнала для события audit_id ("сек:serial")."""
+        sec, serial = _split_audit_id(audit_id)
+        conditions = [
+            LogBlock.min_ts <= sec, LogBlock.max_ts >= sec,
+            LogBlock.min_serial <= serial, LogBlock.max_serial >= serial,
+        ]
+        return [
+            line for line, rec in self._iter_records(conditions, host=host)
+            if rec["audit_id"] == audit_id
+        ]
+
+
+def parse_range(start, end, host=None, db_path=LOG_INDEX_DB):
+    """Разбор событий за интервал [start, end) по индексу (см. LogIndex.parse_range)."""
+    return LogIndex(db_path).parse_range(start, end, host=host)
@@ -1,5 +1,8 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import (
+    Column, Integer, String, Boolean, DateTime, Index, UniqueConstraint,
+    DDL, event, inspect
+)
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -7,9 +10,17 @@ Base = declarative_base()
 
 class AuditEvent(Base):
     __tablename__ = "audit_events"
+    __table_args__ = (
+        # ключ дедупликации: audit_id уникален только в пределах хоста
+        UniqueConstraint("host", "audit_id", "file_path",
+                         name="uq_audit_events_host_audit_file"),
+        # фильтр по хосту в GUI (вместе с сортировкой по id)
+        Index("ix_audit_events_host_id", "host", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
+    host = Column(String, nullable=False)   # хост-источник (node= или имя лога)
     audit_id = Column(String, index=True)   # ID из audit(...) в логе
     timestamp = Column(DateTime, default=datetime.utcnow)
 
@@ -28,3 +39,66 @@ class AuditEvent(Base):
 
     classification = Column(String)   # "normal" / "suspicious"
     reason = Column(String)           # текстовое объяснение
+
+
+# --- полнотекстовый индекс (SQLite FTS5) ---
+# external content: текст хранится только в audit_events, в FTS — лишь индекс.
+# Триггеры держат индекс в актуальном состоянии при импорте, так что
+# поиск по exe / comm / file_path / key / reason не требует LIKE '%...%'.
+FTS_TABLE = "audit_events_fts"
+FTS_COLUMNS = ("exe", "comm", "file_path", "key", "reason")
+
+_fts_cols = ", ".join(FTS_COLUMNS)
+_fts_new = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+_fts_old = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+
+FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{_fts_cols}, content='audit_events', content_rowid='id', "
+    f"tokenize='unicode61', prefix='2 3')",
+
+    f"CREATE TRIGGER IF NOT EXISTS audit_events_fts_ai AFTER INSERT ON audit_events BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_fts_cols}) VALUES (new.id, {_fts_new}); END",
+
+    f"CREATE TRIGGER IF NOT EXISTS audit_events_fts_ad AFTER DELETE ON audit_events BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_fts_cols}) "
+    f"VALUES ('delete', old.id, {_fts_old}); END",
+
+    f"CREATE TRIGGER IF NOT EXISTS audit_events_fts_au AFTER UPDATE ON audit_events BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_fts_cols}) "
+    f"VALUES ('delete', old.id, {_fts_old}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_fts_cols}) VALUES (new.id, {_fts_new}); END",
+]
+
+for _stmt in FTS_DDL:
+    event.listen(
+        AuditEvent.__table__, "after_create",
+        DDL(_stmt).execute_if(dialect="sqlite"),
+    )
+
+
+class OutdatedSchema(RuntimeError):
+    """audit.db не создана или создана старой версией (без host / FTS-индекса)."""
+
+
+def check_schema(engine):
+    """
+    Проверить, что структура audit.db совпадает с моделями.
+    create_all не меняет существующие таблицы, поэтому база, созданная до
+    появления столбца host и FTS-индекса, иначе падает только на первом запросе.
+    """
+    db = engine.url.database
+    insp = inspect(engine)
+    tables = insp.get_table_names()
+    if AuditEvent.__tablename__ not in tables:
+        raise OutdatedSchema(f"База {db} не создана: выполните python init_db.py")
+
+    existing = {c["name"] for c in insp.get_columns(AuditEvent.__tablename__)}
+    missing = [c.name for c in AuditEvent.__table__.columns if c.name not in existing]
+    if FTS_TABLE not in tables:
+        missing.append(FTS_TABLE)
+    if missing:
+        raise OutdatedSchema(
+            f"База {db} создана старой версией (нет: {', '.join(missing)}). "
+            f"Удалите её и создайте заново: python init_db.py, затем повторите импорт."
+        )
@@ -1,4 +1,6 @@
+import os
 import re
+import socket
 from datetime import datetime
 
 # пример: msg=audit(1716996845.123:456):
@@ -12,15 +14,25 @@ def parse_line(line: str):
       {
         'type': 'SYSCALL' | 'PATH' | ...,
         'audit_id': 'sec:id',
+        'host': 'web01' | None,
         'fields': {...}
       }
     или None, если строка не подходит.
+
+    При name_format в auditd.conf (и в логах, собранных через audisp-remote)
+    строка начинается с node=<хост> — его возвращаем в 'host'.
     """
     line = line.strip()
-    if not line.startswith("type="):
+    parts = line.split()
+
+    host = None
+    if parts and parts[0].startswith("node="):
+        host = parts[0].split("=", 1)[1] or None
+        parts = parts[1:]
+
+    if not parts or not parts[0].startswith("type="):
         return None
 
-    parts = line.split()
     record_type = parts[0].split("=", 1)[1]
 
     # ищем msg=...
@@ -51,16 +63,23 @@ def parse_line(line: str):
     return {
         "type": record_type,
         "audit_id": audit_id,
+        "host": host,
         "fields": fields,
     }
 
 
-def parse_log_file(path="/var/log/audit/audit.log"):
+def parse_log_file(path="/var/log/audit/audit.log", host=None, on_record=None):
     """
-    Читает лог auditd и собирает события по audit_id.
+    Читает лог auditd и собирает события по (host, audit_id).
+    host — хост по умолчанию для строк без node=
+    (если не задан, берётся имя текущей машины).
+    on_record(offset, raw, rec) — необязательный обработчик каждой разобранной
+    строки: смещение в байтах, сама строка (bytes) и результат parse_line
+    (используется для построения индекса смещений, см. app/logindex.py).
     Возвращает список словарей:
       {
         'audit_id': str,
+        'host': str,
         'timestamp': datetime,
         'records': {
             'SYSCALL': {...},
@@ -69,30 +88,91 @@ def parse_log_file(path="/var/log/audit/audit.log"):
         }
       }
     """
+    with open(path, "rb") as f:
+        return parse_log_stream(f, host=host, on_record=on_record)
+
+
+def parse_log_stream(f, host=None, on_record=None):
+    """parse_log_file для уже открытого (в режиме "rb") файла, с текущей позиции."""
+    return group_records(_read_records(f, on_record=on_record), default_host=host)
+
+
+def _read_records(f, on_record=None):
+    """Разобранные строки бинарного файла (с подсчётом смещения каждой строки)."""
+    offset = 0
+    for raw in f:
+        rec = parse_line(raw.decode("utf-8", errors="ignore"))
+        if rec:
+            if on_record:
+                on_record(offset, raw, rec)
+            yield rec
+        offset += len(raw)
+
+
+def group_records(records, default_host=None):
+    """Сборка строк (результатов parse_line) в события по (host, audit_id)."""
+    default_host = default_host or socket.gethostname()
     raw_events = {}
 
-    with open(path, "r", errors="ignore") as f:
-        for line in f:
-            rec = parse_line(line)
-            if not rec:
-                continue
-
-            aid = rec["audit_id"]
-            rtype = rec["type"]
-            fields = rec["fields"]
-
-            ev = raw_events.get(aid)
-            if ev is None:
-                ev = {
-                    "audit_id": aid,
-                    "timestamp": fields.get("timestamp"),
-                    "records": {}
-                }
-                raw_events[aid] = ev
-            else:
-                if not ev.get("timestamp") and fields.get("timestamp"):
-                    ev["timestamp"] = fields["timestamp"]
-
-            ev["records"][rtype] = fields
+    for rec in records:
+        aid = rec["audit_id"]
+        rtype = rec["type"]
+        fields = rec["fields"]
+        ev_host = rec["host"] or default_host
+
+        # audit_id уникален только в пределах одного хоста
+        ev = raw_events.get((ev_host, aid))
+        if ev is None:
+            ev = {
+                "audit_id": aid,
+                "host": ev_host,
+                "timestamp": fields.get("timestamp"),
+                "records": {}
+            }
+            raw_events[(ev_host, aid)] = ev
+        else:
+            if not ev.get("timestamp") and fields.get("timestamp"):
+                ev["timestamp"] = fields["timestamp"]
+
+        ev["records"][rtype] = fields
 
     return list(raw_events.values())
+
+
+# audit.log, audit.log.1, ... (сжатые audit.log.2.gz и прочие файлы пропускаются)
+AUDIT_LOG_RE = re.compile(r"^audit\.log(\.\d+)?$")
+# <host>.log, <host>.log.1, ...
+HOST_LOG_RE = re.compile(r"^(.+)\.log(\.\d+)?$")
+
+
+def find_log_sources(path, host=None):
+    """
+    Ищет источники логов для импорта.
+    host — хост для журналов без явного хоста в пути (по умолчанию имя машины).
+    Возвращает список пар (host, путь_к_файлу):
+      - обычный файл -> [(host, path)], для строк с node= хост берётся из записи;
+      - каталог с audit.log[.N] (как /var/log/audit) -> все файлы одного хоста host;
+      - каталог вида <dir>/<host>/audit.log[.N] -> хост = имя подкаталога;
+      - каталог вида <dir>/<host>.log[.N] -> хост = имя файла до ".log".
+    Сжатые ротированные журналы (.gz и т. п.) не читаются.
+    """
+    if not os.path.isdir(path):
+        return [(host, path)]
+
+    sources = []
+    for name in sorted(os.listdir(path)):
+        full = os.path.join(path, name)
+        if os.path.isdir(full):
+            for log_name in sorted(os.listdir(full)):
+                log_path = os.path.join(full, log_name)
+                if os.path.isfile(log_path) and AUDIT_LOG_RE.match(log_name):
+                    sources.append((name, log_path))
+        elif not os.path.isfile(full):
+            continue
+        elif AUDIT_LOG_RE.match(name):
+            sources.append((host, full))
+        else:
+            match = HOST_LOG_RE.match(name)
+            if match:
+                sources.append((match.group(1), full))
+    return sources
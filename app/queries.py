@@ -0,0 +1,116 @@
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from .models import AuditEvent
+from .search import apply_search
+
+# "15m", "2h", "7d", "1w" — относительное время для --since / --until
+_RELATIVE_RE = re.compile(r"^(\d+)([smhdw])$")
+_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+# "1716996900" — секунды эпохи, как в audit(1716996900.123:456);
+# от 9 цифр, чтобы не спутать с датой ISO без разделителей (20240529)
+_EPOCH_RE = re.compile(r"^\d{9,}(\.\d+)?$")
+
+
+def parse_time(value, now=None):
+    """
+    Разбор границы времени: ISO-дата ("2024-05-29", "2024-05-29 10:00:00")
+    относительное значение ("15m", "2h", "7d" — столько-то назад от now)
+    или секунды эпохи ("1716996900").
+    Время в БД локальное (см. parser.parse_line), поэтому и здесь без tz.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+
+    value = value.strip()
+    match = _RELATIVE_RE.match(value)
+    if match:
+        amount, unit = match.groups()
+        now = now or datetime.now()
+        return now - timedelta(**{_UNITS[unit]: int(amount)})
+
+    if _EPOCH_RE.match(value):
+        return datetime.fromtimestamp(float(value))
+
+    return datetime.fromisoformat(value)
+
+
+def apply_filters(stmt, classification=None, event_type=None, uid=None,
+                  host=None, since=None, until=None):
+    """
+    Общие фильтры SOC-панели и CLI для select(...) по audit_events.
+    Пустые значения (None / "") фильтр не добавляют.
+    """
+    if classification:
+        stmt = stmt.where(AuditEvent.classification == classification)
+    if uid:
+        stmt = stmt.where(AuditEvent.uid == uid)
+    if event_type:
+        stmt = stmt.where(AuditEvent.event_type == event_type)
+    if host:
+        stmt = stmt.where(AuditEvent.host == host)
+    if since:
+        stmt = stmt.where(AuditEvent.timestamp >= parse_time(since))
+    if until:
+        stmt = stmt.where(AuditEvent.timestamp < parse_time(until))
+    return stmt
+
+
+# поля, по которым можно группировать агрегаты
+AGGREGATE_FIELDS = (
+    "host", "uid", "auid", "exe", "comm", "file_path",
+    "perm", "event_type", "classification", "key",
+)
+
+# шаги времени для агрегатов (формат strftime в SQLite)
+BUCKETS = {
+    "minute": "%Y-%m-%d %H:%M",
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m",
+}
+
+
+def build_aggregate_query(by, bucket=None, limit=None, search=None, **filters):
+    """
+    GROUP BY в SQL: число событий по полям `by` (и по шагу времени bucket).
+    limit — сколько строк оставить; при заданном bucket — топ-N в каждом шаге.
+    search — полнотекстовый фильтр (см. search.apply_search).
+    filters — те же параметры, что у apply_filters.
+    Сортировка: по времени, внутри шага — по убыванию количества.
+    """
+    group_cols = []
+    if bucket:
+        group_cols.append(
+            func.strftime(BUCKETS[bucket], AuditEvent.timestamp).label("bucket")
+        )
+    for name in by:
+        if name not in AGGREGATE_FIELDS:
+            raise ValueError(f"группировка по полю {name!r} не поддерживается")
+        group_cols.append(getattr(AuditEvent, name).label(name))
+
+    count = func.count().label("count")
+    stmt = select(*group_cols, count).select_from(AuditEvent).group_by(*group_cols)
+    stmt = apply_filters(stmt, **filters)
+    stmt, _ = apply_search(stmt, search)
+
+    if not bucket:
+        stmt = stmt.order_by(count.desc())
+        return stmt.limit(limit) if limit else stmt
+
+    if not limit:
+        return stmt.order_by(group_cols[0], count.desc())
+
+    # топ-N внутри каждого шага времени: ROW_NUMBER() по шагу
+    rank = func.row_number().over(
+        partition_by=group_cols[0], order_by=count.desc()
+    ).label("rank")
+    ranked = stmt.add_columns(rank).subquery()
+    columns = [ranked.c[c.name] for c in group_cols] + [ranked.c["count"]]
+    return (
+        select(*columns)
+        .where(ranked.c["rank"] <= limit)
+        .order_by(ranked.c["bucket"], ranked.c["count"].desc())
+    )
@@ -0,0 +1,98 @@
+import re
+
+from sqlalchemy import column, func, literal_column, select, table
+
+from .models import AuditEvent, FTS_TABLE
+
+# лёгкое описание FTS-таблицы для запросов (в metadata не добавляем —
+# create_all не должен пытаться создать её как обычную таблицу)
+fts = table(FTS_TABLE, column("rowid"), column("rank"))
+
+# bm25 считается только по стольким самым новым совпадениям:
+# ранжирование всех совпадений на больших таблицах занимает секунды
+RANK_CANDIDATES = 5000
+
+# слово = буквы/цифры, всё остальное — разделители (как у токенизатора unicode61)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_match_query(text):
+    """
+    Перевод строки из поля поиска в запрос FTS5 MATCH.
+      "python3"          -> "python3"            (слово целиком)
+      "pyth*"            -> "pyth"*              (по началу слова — только явно)
+      "python3 nc"       -> "python3" AND "nc"
+      "python3 | nc | vim" или "python3 OR nc" -> ... OR ...
+      "/usr/bin/vim"     -> "usr bin vim"        (фраза)
+    Префикс включается только по "*": префиксные индексы есть лишь для 2 и 3
+    символов (prefix='2 3' в models.FTS_DDL), для более длинных FTS5 сливает
+    списки всех подходящих слов целиком, а точное слово отдаёт совпадения
+    потоком, начиная с самых новых.
+    Возвращает None, если искать нечего.
+    """
+    groups = []
+    for alt in re.split(r"\s*\|\s*|\s+OR\s+", text.strip()):
+        terms = []
+        for term in alt.split():
+            words = _WORD_RE.findall(term)
+            if not words:
+                continue
+            # фраза из слов терма; "*" в конце — последнее слово по префиксу
+            star = "*" if term.endswith("*") else ""
+            terms.append('"' + " ".join(words) + '"' + star)
+        if terms:
+            groups.append("(" + " AND ".join(terms) + ")")
+
+    if not groups:
+        return None
+    return " OR ".join(groups)
+
+
+def _match(query):
+    return literal_column(FTS_TABLE).op("MATCH")(query)
+
+
+def apply_search(stmt, text):
+    """
+    Добавить к select(...) по audit_events полнотекстовый фильтр.
+    Если строка пустая — stmt возвращается без изменений.
+    Возвращает (stmt, active): active=True, если фильтр добавлен.
+    Сортировку задаёт вызывающий код по id_column(active).
+    """
+    query = build_match_query(text or "")
+    if not query:
+        return stmt, False
+
+    stmt = stmt.join(fts, fts.c.rowid == AuditEvent.id).where(_match(query))
+    return stmt, True
+
+
+def id_column(active):
+    """
+    Колонка id для ORDER BY и keyset-пагинации (WHERE id < последний).
+    При поиске это rowid FTS-таблицы: FTS5 сам отдаёт совпадения в порядке rowid,
+    и SQLite не сортирует их целиком во временном B-дереве.
+    """
+    return fts.c.rowid if active else AuditEvent.id
+
+
+def apply_ranking(stmt, text, candidates=RANK_CANDIDATES):
+    """
+    Сортировка по релевантности (bm25) для stmt после apply_search.
+    Ранжируются только `candidates` самых новых совпадений (rowid >= граница),
+    поэтому время не растёт с размером таблицы; пагинация — через OFFSET
+    внутри этого окна.
+    """
+    query = build_match_query(text or "")
+    if not query:
+        return stmt
+
+    newest = (
+        select(fts.c.rowid)
+        .where(_match(query))
+        .order_by(fts.c.rowid.desc())
+        .limit(candidates)
+        .subquery()
+    )
+    cutoff = select(func.min(newest.c.rowid)).scalar_subquery()
+    return stmt.where(fts.c.rowid >= cutoff).order_by(fts.c.rank, fts.c.rowid.desc())
@@ -0,0 +1,35 @@
+# корень проекта в sys.path, чтобы тесты из tests/ импортировали app.*
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.models import Base, AuditEvent
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """
+    Фабрика audit.db во временном каталоге:
+    make_db([{"exe": ...}, ...], name="audit.db") -> engine.
+    Незаданные поля события заполняются значениями по умолчанию,
+    audit_id уникален в пределах теста (повторный вызов дописывает строки).
+    """
+    counter = iter(range(1, 10 ** 9))
+
+    def make(events=(), name="audit.db"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            for fields in events:
+                n = next(counter)
+                session.add(AuditEvent(**{
+                    "host": "h", "audit_id": f"{n}:{n}",
+                    "timestamp": datetime(2024, 5, 29), "file_path": "/etc/shadow",
+                    **fields,
+                }))
+            session.commit()
+        return engine
+
+    return make
@@ -1,59 +1,149 @@
-from sqlalchemy import create_engine, select
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
-from app.models import Base, AuditEvent
-from app.parser import parse_log_file
+from app.models import Base, AuditEvent, OutdatedSchema, check_schema
+from app.parser import parse_log_stream, find_log_sources
 from app.classifier import classify_event
+from app.columnar import ColumnarUnavailable, sync_columnar
+from app.logindex import BlockIndexer, LogIndex, LOG_INDEX_DB, stream_fingerprint
 
+# сколько строк пишем в БД за один INSERT (executemany)
+BATCH_SIZE = 5000
 
-def import_events(log_path="/var/log/audit/audit.log"):
-    engine = create_engine("sqlite:///audit.db")
-    Base.metadata.bind = engine
-    session = Session(engine)
 
-    events = parse_log_file(log_path)
-    count_new = 0
+def load_source(source):
+    """
+    Разбор и классификация одного источника
+    (host, путь, отпечаток файла, с какого байта индексировать — см. LogIndex.resume_point).
+    Заодно собираются блоки индекса смещений (app/logindex.py) — за тот же проход;
+    они возвращаются готовыми аргументами для LogIndex.add_blocks.
+    Выполняется в отдельном процессе пула, в БД ничего не пишет.
+    """
+    host, path, fingerprint, index_from = source
+    with open(path, "rb") as f:
+        # между resume_point и открытием файл могли ротировать:
+        # тогда по этому пути уже другой файл, и индексировать его нужно с начала
+        actual = stream_fingerprint(f, host)
+        if actual != fingerprint:
+            fingerprint, index_from = actual, 0
+
+        indexer = BlockIndexer(index_from)
+        events = parse_log_stream(f, host=host, on_record=indexer)
+
+        # файл переименовали во время разбора — его текущий путь неизвестен
+        index_path = path if _same_file(path, f) else None
 
+    rows = []
     for ev in events:
         cls = classify_event(ev)
 
         # если нет файла (например, событие не PATH по нашим файлам) — пропускаем
         if not cls["file_path"]:
             continue
+        rows.append(cls)
+    blocks, indexed_size = indexer.finish()
+    return path, rows, (fingerprint, index_path, host, blocks, indexed_size)
 
-        # чтобы не создавать дубликаты — проверяем по audit_id + file_path
-        stmt = select(AuditEvent).where(
-            AuditEvent.audit_id == cls["audit_id"],
-            AuditEvent.file_path == cls["file_path"],
-        )
-        existing = session.scalars(stmt).first()
-        if existing:
-            continue
 
-        ae = AuditEvent(
-            audit_id=cls["audit_id"],
-            timestamp=cls["timestamp"],
-            uid=cls["uid"],
-            auid=cls["auid"],
-            exe=cls["exe"],
-            comm=cls["comm"],
-            syscall=cls["syscall"],
-            file_path=cls["file_path"],
-            perm=cls["perm"],
-            key=cls["key"],
-            event_type=cls["event_type"],   # записываем тип события
-            success=cls["success"],
-            classification=cls["classification"],
-            reason=cls["reason"],
-        )
-
-        session.add(ae)
-        count_new += 1
-
-    session.commit()
-    session.close()
-    print(f"Импорт завершён, добавлено {count_new} новых событий.")
+def _same_file(path, f):
+    """Указывает ли path всё ещё на открытый файл f."""
+    try:
+        return os.path.samestat(os.stat(path), os.fstat(f.fileno()))
+    except FileNotFoundError:
+        return False
+
+
+def write_rows(session, rows):
+    """Пакетная запись строк; дубликаты (host + audit_id + file_path) пропускаются."""
+    stmt = insert(AuditEvent).on_conflict_do_nothing()
+    for start in range(0, len(rows), BATCH_SIZE):
+        session.execute(stmt, rows[start:start + BATCH_SIZE])
+
+
+def import_events(log_path="/var/log/audit/audit.log", workers=None, columnar_dir=None,
+                  index_db=LOG_INDEX_DB, host=None):
+    """
+    Импорт событий из файла лога или каталога с логами нескольких хостов.
+    Источники разбираются параллельно пулом процессов,
+    а пишет в SQLite только один (текущий) процесс — пакетами.
+    columnar_dir — после импорта дописать новые события в колоночное хранилище.
+    index_db — база индекса смещений по сырым логам (дополняется при каждом импорте).
+    host — хост для журналов, у которых он не задан ни в пути, ни в node=
+    (по умолчанию имя текущей машины). Один и тот же журнал нужно импортировать
+    с одним и тем же хостом: он входит в ключ дедупликации.
+    """
+    engine = create_engine("sqlite:///audit.db")
+    Base.metadata.bind = engine
+    try:
+        check_schema(engine)
+    except OutdatedSchema as exc:
+        raise SystemExit(str(exc))
+    log_index = LogIndex(index_db)
+
+    sources = [
+        (src_host, path, *log_index.resume_point(path, src_host))
+        for src_host, path in find_log_sources(log_path, host=host)
+    ]
+    count_stmt = select(func.count()).select_from(AuditEvent)
+
+    with Session(engine) as session:
+        count_before = session.scalar(count_stmt)
+
+        if len(sources) == 1 or workers == 1:
+            for source in sources:
+                path, rows, index = load_source(source)
+                write_rows(session, rows)
+                session.commit()
+                log_index.add_blocks(*index)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(load_source, s) for s in sources]
+                for fut in as_completed(futures):
+                    path, rows, index = fut.result()
+                    write_rows(session, rows)
+                    session.commit()
+                    log_index.add_blocks(*index)
+                    print(f"{path}: обработано {len(rows)} событий")
+
+        count_new = session.scalar(count_stmt) - count_before
+
+    print(
+        f"Импорт завершён ({len(sources)} источников), "
+        f"добавлено {count_new} новых событий."
+    )
+
+    if columnar_dir:
+        try:
+            copied = sync_columnar(engine, columnar_dir)
+        except ColumnarUnavailable as exc:
+            raise SystemExit(str(exc))
+        print(f"В колоночное хранилище {columnar_dir} записано {copied} событий.")
 
 
 if __name__ == "__main__":
-    import_events()
+    parser = argparse.ArgumentParser(description="Импорт событий auditd в audit.db")
+    parser.add_argument(
+        "path", nargs="?", default="/var/log/audit/audit.log",
+        help="файл audit.log или каталог: /var/log/audit, <dir>/<host>/audit.log[.N] "
+             "или <dir>/<host>.log[.N]",
+    )
+    parser.add_argument(
+        "--host", default=None,
+        help="хост для файла или каталога audit.log[.N] (по умолчанию имя этой машины)",
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None,
+        help="число процессов для разбора (по умолчанию — число CPU)",
+    )
+    parser.add_argument(
+        "--columnar", metavar="DIR", default=None,
+        help="дополнительно писать события в колоночное хранилище (parquet, нужен pyarrow)",
+    )
+    args = parser.parse_args()
+    import_events(args.path, workers=args.workers, columnar_dir=args.columnar,
+                  host=args.host)
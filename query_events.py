@@ -0,0 +1,223 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+from sqlalchemy import Integer, create_engine, select
+
+from app.models import AuditEvent, OutdatedSchema, check_schema
+from app.queries import (
+    apply_filters, build_aggregate_query, parse_time, AGGREGATE_FIELDS, BUCKETS
+)
+from app.search import apply_search, id_column
+from app.export import FORMATS, open_stmt_writer, open_writer
+from app.columnar import COLUMNAR_DIR, ColumnarUnavailable, aggregate_columnar
+from app.logindex import LogIndex, LOG_INDEX_DB
+
+# сколько строк читаем из курсора за раз (память не зависит от размера выборки)
+FETCH_SIZE = 5000
+
+
+def time_arg(value):
+    """Тип аргумента --since / --until: ошибка разбора — обычная ошибка использования."""
+    try:
+        return parse_time(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"неверное время {value!r}: ожидается дата ISO (2024-05-29 10:00), "
+            f"15m / 2h / 7d или секунды эпохи"
+        )
+
+
+def audit_id_arg(value):
+    """Тип аргумента --audit-id: "сек:serial", как в audit(1716996845.123:456)."""
+    if not re.fullmatch(r"\d+:\d+", value.strip()):
+        raise argparse.ArgumentTypeError(
+            f"неверный audit_id {value!r}: ожидается сек:serial, например 1716996845:456"
+        )
+    return value.strip()
+
+
+def add_filter_args(parser):
+    """Те же фильтры, что в SOC-панели (MainWindow.load_data)."""
+    parser.add_argument("--classification", choices=["suspicious", "normal"])
+    parser.add_argument("--type", dest="event_type",
+                        help="тип события: accounts / privilege / remote_access / logging")
+    parser.add_argument("--uid")
+    parser.add_argument("--host")
+    parser.add_argument("--since", type=time_arg,
+                        help='с какого времени: "2024-05-29 10:00" или 15m / 2h / 7d')
+    parser.add_argument("--until", type=time_arg,
+                        help="до какого времени (не включая), формат как у --since")
+    parser.add_argument("--search",
+                        help='полнотекстовый поиск, например "python3 | nc" или "pyth*"')
+    parser.add_argument("-f", "--format", choices=FORMATS, default="csv")
+    parser.add_argument("-o", "--output", default="-", help="файл результата, - = stdout")
+
+
+def filters_from_args(args):
+    return {
+        "classification": args.classification,
+        "event_type": args.event_type,
+        "uid": args.uid,
+        "host": args.host,
+        "since": args.since,
+        "until": args.until,
+    }
+
+
+def stream_rows(engine, stmt, writer):
+    """Потоковая выгрузка результата stmt пачками по FETCH_SIZE. Возвращает последнюю строку."""
+    last = None
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=FETCH_SIZE).execute(stmt)
+        for rows in result.partitions():
+            writer.write(rows)
+            last = rows[-1]
+    return last
+
+
+def cmd_export(engine, args):
+    """
+    Выгрузка событий по возрастанию id.
+    --follow: после выгрузки опрашиваем БД и дописываем новые строки
+    (keyset: WHERE id > последний выгруженный id).
+    """
+    events = AuditEvent.__table__
+    base = apply_filters(select(events), **filters_from_args(args))
+    base, searching = apply_search(base, args.search)
+    id_col = id_column(searching)
+
+    writer, out = open_stmt_writer(args.format, args.output, base)
+    last_id = args.after_id
+    try:
+        while True:
+            stmt = base.where(id_col > last_id).order_by(id_col)
+            last = stream_rows(engine, stmt, writer)
+            if last is not None:
+                last_id = last.id
+            if not args.follow:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        if out:
+            out.close()
+
+
+def cmd_stats(engine, args):
+    """
+    Агрегаты (COUNT ... GROUP BY) считаются в SQLite или в колоночном
+    хранилище (--store columnar), сюда приходят только итоги.
+    """
+    if args.store == "columnar":
+        if args.search:
+            raise SystemExit("--search работает только с --store sqlite (FTS-индекс)")
+        try:
+            columns, rows = aggregate_columnar(
+                args.by, bucket=args.bucket, root=args.columnar_dir,
+                limit=args.limit, **filters_from_args(args)
+            )
+        except ColumnarUnavailable as exc:
+            raise SystemExit(str(exc))
+        types = [None] * (len(columns) - 1) + [Integer()]
+        writer, out = open_writer(args.format, args.output, columns, types)
+        try:
+            writer.write(rows)
+        finally:
+            writer.close()
+            if out:
+                out.close()
+        return
+
+    stmt = build_aggregate_query(
+        args.by, bucket=args.bucket, limit=args.limit, search=args.search,
+        **filters_from_args(args)
+    )
+
+    writer, out = open_stmt_writer(args.format, args.output, stmt)
+    try:
+        stream_rows(engine, stmt, writer)
+    finally:
+        writer.close()
+        if out:
+            out.close()
+
+
+def cmd_raw(args):
+    """Исходные строки журнала за интервал или для одного audit_id — через индекс смещений."""
+    log_index = LogIndex(args.index_db)
+    if args.audit_id:
+        lines = log_index.find_event_lines(args.audit_id, host=args.host)
+    else:
+        if not (args.since and args.until):
+            raise SystemExit("укажите --audit-id или оба параметра --since и --until")
+        lines = (line for line, _ in
+                 log_index.iter_range_lines(args.since, args.until, host=args.host))
+
+    for line in lines:
+        sys.stdout.write(line + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запросы к audit.db без графического интерфейса")
+    parser.add_argument("--db", default="audit.db", help="путь к базе SQLite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_export = sub.add_parser("export", help="выгрузка событий в CSV / JSONL / Parquet")
+    add_filter_args(p_export)
+    p_export.add_argument("--after-id", type=int, default=0,
+                          help="выгружать только события с id больше указанного")
+    p_export.add_argument("--follow", action="store_true",
+                          help="не завершаться, дописывать новые события")
+    p_export.add_argument("--interval", type=float, default=2.0,
+                          help="период опроса для --follow, сек")
+
+    p_stats = sub.add_parser("stats", help="количество событий по полям / шагам времени")
+    add_filter_args(p_stats)
+    p_stats.add_argument("--by", nargs="+", choices=AGGREGATE_FIELDS, default=["auid"])
+    p_stats.add_argument("--bucket", choices=list(BUCKETS))
+    p_stats.add_argument("--limit", type=int,
+                         help="сколько строк вывести; с --bucket — топ-N в каждом шаге")
+    p_stats.add_argument("--store", choices=["sqlite", "columnar"], default="sqlite",
+                         help="откуда считать агрегаты")
+    p_stats.add_argument("--columnar-dir", default=COLUMNAR_DIR,
+                         help="каталог колоночного хранилища (см. import_events.py --columnar)")
+
+    p_raw = sub.add_parser("raw", help="исходные строки audit.log по индексу смещений")
+    p_raw.add_argument("--since", type=time_arg,
+                       help="начало интервала, формат как у export --since")
+    p_raw.add_argument("--until", type=time_arg, help="конец интервала (не включая)")
+    p_raw.add_argument("--audit-id", type=audit_id_arg,
+                       help='событие "сек:serial", например 1716996845:456')
+    p_raw.add_argument("--host")
+    p_raw.add_argument("--index-db", default=LOG_INDEX_DB, help="база индекса смещений")
+
+    args = parser.parse_args(argv)
+    engine = create_engine(f"sqlite:///{args.db}")
+    if args.command != "raw":
+        try:
+            check_schema(engine)
+        except OutdatedSchema as exc:
+            raise SystemExit(str(exc))
+
+    try:
+        if args.command == "export":
+            cmd_export(engine, args)
+        elif args.command == "stats":
+            cmd_stats(engine, args)
+        else:
+            cmd_raw(args)
+    except BrokenPipeError:
+        # вывод закрыли (например, "| head"): молча выходим; stdout перенаправляем
+        # в devnull, чтобы Python не упал ещё раз при сбросе буфера на выходе
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
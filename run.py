@@ -1,12 +1,21 @@
 import sys
-from PyQt6.QtWidgets import QApplication
+from PyQt6.QtWidgets import QApplication, QMessageBox
+from sqlalchemy import create_engine
 
 from app.gui import MainWindow
+from app.models import OutdatedSchema, check_schema
 
 
 def main():
     app = QApplication(sys.argv)
 
+    # старая audit.db (без host / FTS) — сообщение вместо трассировки SQLAlchemy
+    try:
+        check_schema(create_engine("sqlite:///audit.db"))
+    except OutdatedSchema as exc:
+        QMessageBox.critical(None, "audit.db", str(exc))
+        sys.exit(1)
+
     window = MainWindow()
     window.show()
 
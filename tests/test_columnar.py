@@ -0,0 +1,69 @@
+import os
+import shutil
+from datetime import datetime
+
+import pytest
+
+from app.queries import build_aggregate_query
+
+pytest.importorskip("pyarrow")
+
+from app.columnar import aggregate_columnar, sync_columnar  # noqa: E402
+
+
+def _events(count):
+    return [
+        {"host": "web01" if i % 2 else "db01", "timestamp": datetime(2024, 5, 1 + i % 3, 10),
+         "exe": "/usr/bin/cat", "classification": "normal"}
+        for i in range(count)
+    ]
+
+
+def test_sync_is_incremental_and_matches_sqlite(make_db, tmp_path):
+    engine = make_db(_events(10))
+    root = str(tmp_path / "col")
+
+    assert sync_columnar(engine, root) == 10
+    assert sync_columnar(engine, root) == 0
+
+    _, rows = aggregate_columnar(["host"], bucket="day", root=root)
+    with engine.connect() as conn:
+        expected = [tuple(r) for r in conn.execute(build_aggregate_query(["host"], bucket="day"))]
+    assert sorted(rows) == sorted(expected)
+
+
+def test_empty_store_returns_no_rows(make_db, tmp_path):
+    engine = make_db()
+    root = str(tmp_path / "col")
+
+    assert sync_columnar(engine, root) == 0
+    assert aggregate_columnar(["classification", "perm"], root=root) == (
+        ["classification", "perm", "count"], []
+    )
+
+
+def test_recreated_database_rebuilds_store(make_db, tmp_path):
+    root = str(tmp_path / "col")
+    sync_columnar(make_db(_events(10), name="old.db"), root)
+
+    # новая audit.db: id снова с 1, строк меньше, чем было скопировано
+    assert sync_columnar(make_db(_events(4), name="new.db"), root) == 4
+    _, rows = aggregate_columnar(["exe"], root=root)
+    assert rows == [("/usr/bin/cat", 4)]
+
+
+def test_repeated_syncs_keep_one_file_per_day(make_db, tmp_path):
+    root = tmp_path / "col"
+    day = root / "day=2024-05-29"
+    for _ in range(5):
+        sync_columnar(make_db([{}, {}]), str(root))
+        assert len(os.listdir(day)) == 1
+
+    # сбой между переименованиями в _compact_day: day=... уже нет
+    os.rename(day, root / "_new_day=2024-05-29")
+    shutil.copytree(root / "_new_day=2024-05-29", root / "_old_day=2024-05-29")
+    assert sync_columnar(make_db(), str(root)) == 0
+
+    assert sorted(os.listdir(root)) == ["_state.json", "day=2024-05-29"]
+    _, rows = aggregate_columnar(["host"], root=str(root))
+    assert rows == [("h", 10)]
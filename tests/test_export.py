@@ -0,0 +1,65 @@
+import csv
+import json
+from datetime import datetime
+
+import pytest
+
+import query_events
+
+EVENTS = [
+    {"exe": "/usr/bin/cat", "timestamp": datetime(2024, 5, 29, 15, 20, 14), "success": True},
+    {"exe": "/usr/bin/vim", "timestamp": datetime(2024, 5, 29, 15, 21), "success": False},
+    {"exe": "/usr/bin/vim", "timestamp": datetime(2024, 5, 29, 15, 22)},
+]
+
+
+def _export(tmp_path, *args):
+    out = tmp_path / "out"
+    query_events.main(["--db", str(tmp_path / "audit.db"), "export", "-o", str(out), *args])
+    return out
+
+
+def test_csv_round_trip(make_db, tmp_path):
+    make_db(EVENTS)
+    with open(_export(tmp_path, "-f", "csv"), newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [(r["id"], r["exe"]) for r in rows] == [
+        ("1", "/usr/bin/cat"), ("2", "/usr/bin/vim"), ("3", "/usr/bin/vim")
+    ]
+    assert rows[0]["timestamp"] == "2024-05-29 15:20:14"
+
+
+def test_jsonl_round_trip_with_iso_timestamps(make_db, tmp_path):
+    make_db(EVENTS)
+    out = _export(tmp_path, "-f", "jsonl", "--search", "vim")
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [(r["id"], r["success"]) for r in records] == [(2, False), (3, None)]
+    assert records[0]["timestamp"] == "2024-05-29T15:21:00"
+    assert datetime.fromisoformat(records[0]["timestamp"]) == EVENTS[1]["timestamp"]
+
+
+def test_parquet_round_trip(make_db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    make_db(EVENTS)
+    table = pq.read_table(_export(tmp_path, "-f", "parquet", "--after-id", "1"))
+    assert table.column("id").to_pylist() == [2, 3]
+    assert table.column("timestamp").to_pylist() == [e["timestamp"] for e in EVENTS[1:]]
+    assert table.column("success").to_pylist() == [False, None]
+
+
+def test_follow_continues_after_last_exported_id(make_db, tmp_path, monkeypatch):
+    make_db(EVENTS)
+    polls = []
+
+    def sleep(_):
+        # первый опрос: в базе появились новые события; второй — Ctrl+C
+        polls.append(1)
+        if len(polls) == 1:
+            make_db([{"exe": "/usr/bin/nc"}, {"exe": "/usr/bin/vim"}])
+        else:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(query_events.time, "sleep", sleep)
+    out = _export(tmp_path, "-f", "jsonl", "--follow", "--after-id", "1")
+    ids = [json.loads(line)["id"] for line in out.read_text(encoding="utf-8").splitlines()]
+    assert ids == [2, 3, 4, 5]
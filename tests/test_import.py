@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import Base, AuditEvent
+from import_events import import_events
+
+LOG = (
+    'type=SYSCALL msg=audit(1716996845.1:1): uid=1000 auid=1000 exe="/usr/bin/cat"\n'
+    'type=PATH msg=audit(1716996845.1:1): name="/etc/shadow"\n'
+    'type=SYSCALL msg=audit(1716996846.1:2): uid=0 auid=0 exe="/usr/bin/vim"\n'
+    'type=PATH msg=audit(1716996846.1:2): name="/etc/passwd"\n'
+)
+
+
+def _hosts_and_ids(engine):
+    with Session(engine) as session:
+        return sorted(session.execute(select(AuditEvent.host, AuditEvent.audit_id)).all())
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """import_events пишет в audit.db / audit_logidx.db текущего каталога."""
+    monkeypatch.chdir(tmp_path)
+    Base.metadata.create_all(create_engine("sqlite:///audit.db"))
+    for host in ("web01", "web02"):
+        log = tmp_path / "logs" / host / "audit.log"
+        log.parent.mkdir(parents=True)
+        log.write_text(LOG)
+    return tmp_path
+
+
+def test_same_audit_id_on_two_hosts_and_reimport(workdir):
+    engine = create_engine("sqlite:///audit.db")
+
+    import_events("logs", workers=2)   # пул процессов
+    expected = [
+        ("web01", "1716996845:1"), ("web01", "1716996846:2"),
+        ("web02", "1716996845:1"), ("web02", "1716996846:2"),
+    ]
+    assert _hosts_and_ids(engine) == expected
+
+    # повторный импорт (последовательный путь) не дублирует строки
+    import_events("logs", workers=1)
+    import_events(str(workdir / "logs" / "web01" / "audit.log"), host="web01")
+    assert _hosts_and_ids(engine) == expected
+
+
+def test_old_schema_is_reported(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("audit.db")
+    conn.execute("CREATE TABLE audit_events (id INTEGER PRIMARY KEY, audit_id TEXT)")
+    conn.close()
+    (tmp_path / "audit.log").write_text(LOG)
+
+    with pytest.raises(SystemExit, match="init_db.py"):
+        import_events("audit.log")
@@ -0,0 +1,172 @@
+import os
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.logindex import BlockIndexer, LogBlock, LogFile, LogIndex
+from app.parser import parse_log_file
+from import_events import load_source
+import query_events
+
+START = 1716996000
+
+
+def _lines(first, count, node=None):
+    prefix = f"node={node} " if node else ""
+    out = []
+    for serial in range(first, first + count):
+        stamp = f"{START + serial}.000:{serial}"
+        out.append(f'{prefix}type=SYSCALL msg=audit({stamp}): uid=0 exe="/usr/bin/cat"\n')
+        out.append(f'{prefix}type=PATH msg=audit({stamp}): name="/etc/shadow"\n')
+    return "".join(out)
+
+
+def _index(log_index, path, host="h"):
+    """То же, что import_events делает для одного источника (блоки по 256 байт)."""
+    fingerprint, offset = log_index.resume_point(str(path), host)
+    indexer = BlockIndexer(offset, block_size=256)
+    parse_log_file(str(path), host=host, on_record=indexer)
+    log_index.add_blocks(fingerprint, str(path), host, *indexer.finish())
+    return offset
+
+
+def _import(log_index, path, host="h"):
+    """Как import_events: resume_point в основном процессе, разбор — load_source."""
+    _, _, index = load_source((host, str(path), *log_index.resume_point(str(path), host)))
+    log_index.add_blocks(*index)
+
+
+def _block_count(log_index):
+    with Session(log_index.engine) as session:
+        return session.scalar(select(func.count()).select_from(LogBlock))
+
+
+def test_append_indexes_only_tail(tmp_path):
+    log = tmp_path / "audit.log"
+    log.write_text(_lines(0, 10))
+    log_index = LogIndex(str(tmp_path / "idx.db"))
+
+    assert _index(log_index, log) == 0
+    size = os.path.getsize(log)
+    blocks = _block_count(log_index)
+
+    with open(log, "a") as f:
+        f.write(_lines(10, 5))
+    assert _index(log_index, log) == size
+    assert _block_count(log_index) > blocks
+
+    lines = [line for line, _ in log_index.iter_range_lines(START, START + 100)]
+    assert lines == log.read_text().splitlines()
+
+
+def test_unfinished_last_line_is_indexed_later(tmp_path):
+    log = tmp_path / "audit.log"
+    complete = _lines(0, 3)
+    tail = _lines(3, 1)
+    log.write_text(complete + tail[:20])
+    log_index = LogIndex(str(tmp_path / "idx.db"))
+
+    _index(log_index, log)
+    assert log_index.resume_point(str(log), "h")[1] == len(complete)
+
+    log.write_text(complete + tail)
+    assert _index(log_index, log) == len(complete)
+    assert log_index.find_event_lines(f"{START + 3}:3") == tail.splitlines()
+
+
+def test_rotation_keeps_index_of_renamed_file(tmp_path):
+    log = tmp_path / "audit.log"
+    log.write_text(_lines(0, 10))
+    log_index = LogIndex(str(tmp_path / "idx.db"))
+    _index(log_index, log)
+
+    rotated = tmp_path / "audit.log.1"
+    os.rename(log, rotated)
+    log.write_text(_lines(10, 10))
+
+    # переименованный файл узнаётся по отпечатку и заново не индексируется
+    assert _index(log_index, rotated) == os.path.getsize(rotated)
+    assert _index(log_index, log) == 0
+
+    with Session(log_index.engine) as session:
+        paths = sorted(f.path for f in session.scalars(select(LogFile)))
+    assert paths == [str(log), str(rotated)]
+    assert log_index.find_event_lines(f"{START + 5}:5") == _lines(5, 1).splitlines()
+    assert log_index.find_event_lines(f"{START + 15}:15") == _lines(15, 1).splitlines()
+
+
+def test_rotation_between_resume_point_and_parse(tmp_path):
+    log = tmp_path / "audit.log"
+    rotated = tmp_path / "audit.log.1"
+    log.write_text(_lines(0, 10))
+    log_index = LogIndex(str(tmp_path / "idx.db"))
+    _import(log_index, log)
+
+    with open(log, "a") as f:
+        f.write(_lines(10, 10))
+    stale = log_index.resume_point(str(log), "h")
+
+    # auditd ротирует журнал, пока источник ждёт своей очереди в пуле
+    # новый файл длиннее проиндексированной части старого, но короче всего старого
+    os.rename(log, rotated)
+    log.write_text(_lines(20, 15))
+    _, _, index = load_source(("h", str(log), *stale))
+    log_index.add_blocks(*index)
+
+    _import(log_index, rotated)
+    _import(log_index, log)
+
+    assert log_index.find_event_lines(f"{START + 12}:12") == _lines(12, 1).splitlines()
+    lines = [line for line, _ in log_index.iter_range_lines(START, START + 100)]
+    assert sorted(lines) == sorted(_lines(0, 35).splitlines())
+
+
+def test_truncated_file_is_reindexed(tmp_path):
+    log = tmp_path / "audit.log"
+    log.write_text(_lines(0, 10))
+    log_index = LogIndex(str(tmp_path / "idx.db"))
+    _index(log_index, log)
+
+    # тот же первый ряд, но файл короче проиндексированного
+    log.write_text(_lines(0, 2))
+    assert _index(log_index, log) == 0
+    lines = [line for line, _ in log_index.iter_range_lines(START, START + 100)]
+    assert lines == log.read_text().splitlines()
+
+
+def test_parse_range_matches_full_parse(tmp_path):
+    log = tmp_path / "audit.log"
+    log.write_text(_lines(0, 40) + _lines(0, 40, node="web02"))
+    log_index = LogIndex(str(tmp_path / "idx.db"))
+    _index(log_index, log)
+
+    start, end = START + 7, START + 23
+    expected = [
+        e for e in parse_log_file(str(log), host="h")
+        if start <= e["timestamp"].timestamp() < end
+    ]
+    got = log_index.parse_range(str(start), str(end))
+
+    def key(e):
+        return e["host"], e["audit_id"]
+
+    assert len(got) == 2 * 16
+    assert sorted(got, key=key) == sorted(expected, key=key)
+    assert {e["host"] for e in log_index.parse_range(start, end, host="web02")} == {"web02"}
+
+
+def test_raw_cli_accepts_epoch_and_rejects_bad_audit_id(tmp_path, capsys):
+    log = tmp_path / "audit.log"
+    log.write_text(_lines(0, 10))
+    index_db = str(tmp_path / "idx.db")
+    _index(LogIndex(index_db), log)
+
+    query_events.main(["raw", "--index-db", index_db,
+                       "--since", str(START + 2), "--until", str(START + 4)])
+    assert capsys.readouterr().out.splitlines() == _lines(2, 2).splitlines()
+
+    with pytest.raises(SystemExit) as exc:
+        query_events.main(["raw", "--index-db", index_db, "--audit-id", "bad"])
+    assert exc.value.code == 2
+    assert "audit_id" in capsys.readouterr().err
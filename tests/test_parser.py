@@ -0,0 +1,56 @@
+from app.parser import find_log_sources, parse_line, parse_log_file
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("")
+
+
+def test_parse_line_with_node():
+    rec = parse_line('node=web01 type=PATH msg=audit(1716996845.123:456): name="/etc/shadow"')
+    assert rec["host"] == "web01"
+    assert rec["type"] == "PATH"
+    assert rec["audit_id"] == "1716996845:456"
+    assert rec["fields"]["name"] == "/etc/shadow"
+
+
+def test_parse_log_file_groups_by_host(tmp_path):
+    log = tmp_path / "audit.log"
+    log.write_text(
+        'node=a type=SYSCALL msg=audit(1716996845.1:1): uid=0\n'
+        'node=b type=SYSCALL msg=audit(1716996845.1:1): uid=1000\n'
+        'type=SYSCALL msg=audit(1716996845.1:1): uid=5\n'
+    )
+    events = parse_log_file(str(log), host="c")
+    assert sorted(e["host"] for e in events) == ["a", "b", "c"]
+
+
+def test_find_log_sources_flat_audit_dir(tmp_path):
+    for name in ("audit.log", "audit.log.1", "audit.log.2.gz", "notes.txt"):
+        _touch(tmp_path / name)
+
+    assert find_log_sources(str(tmp_path)) == [
+        (None, str(tmp_path / "audit.log")),
+        (None, str(tmp_path / "audit.log.1")),
+    ]
+    assert {h for h, _ in find_log_sources(str(tmp_path), host="srv1")} == {"srv1"}
+
+
+def test_find_log_sources_per_host_layouts(tmp_path):
+    for name in ("web01/audit.log", "web01/audit.log.1", "web01/audit.log.2.gz",
+                 "web01/other.log", "db01.log", "db01.log.1", "db01.log.2.gz"):
+        _touch(tmp_path / name)
+
+    assert find_log_sources(str(tmp_path)) == [
+        ("db01", str(tmp_path / "db01.log")),
+        ("db01", str(tmp_path / "db01.log.1")),
+        ("web01", str(tmp_path / "web01" / "audit.log")),
+        ("web01", str(tmp_path / "web01" / "audit.log.1")),
+    ]
+
+
+def test_find_log_sources_single_file_host(tmp_path):
+    _touch(tmp_path / "audit.log")
+    assert find_log_sources(str(tmp_path / "audit.log"), host="web01") == [
+        ("web01", str(tmp_path / "audit.log")),
+    ]
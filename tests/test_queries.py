@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.queries import build_aggregate_query, parse_time
+
+
+def test_parse_time():
+    now = datetime(2024, 5, 29, 12, 0)
+    assert parse_time("2h", now=now) == datetime(2024, 5, 29, 10, 0)
+    assert parse_time("2024-05-29 10:00") == datetime(2024, 5, 29, 10, 0)
+    assert parse_time("1716996900") == datetime.fromtimestamp(1716996900)
+    assert parse_time("20240529") == datetime(2024, 5, 29)
+    with pytest.raises(ValueError):
+        parse_time("foo")
+
+
+def test_aggregate_limit_is_per_bucket(make_db):
+    engine = make_db([
+        {"timestamp": datetime.fromisoformat(ts), "exe": exe} for ts, exe in [
+            ("2024-05-01 10:00", "/usr/bin/cat"), ("2024-05-01 11:00", "/usr/bin/cat"),
+            ("2024-05-01 12:00", "/usr/bin/vim"),
+            ("2024-05-02 10:00", "/usr/bin/vim"), ("2024-05-02 11:00", "/usr/bin/vim"),
+            ("2024-05-02 12:00", "/usr/bin/nc"),
+        ]
+    ])
+    with Session(engine) as session:
+        rows = session.execute(build_aggregate_query(["exe"], bucket="day", limit=1)).all()
+        assert [tuple(r) for r in rows] == [
+            ("2024-05-01", "/usr/bin/cat", 2),
+            ("2024-05-02", "/usr/bin/vim", 2),
+        ]
+        rows = session.execute(build_aggregate_query(["exe"], limit=1)).all()
+        assert [tuple(r) for r in rows] == [("/usr/bin/vim", 3)]
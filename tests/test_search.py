@@ -0,0 +1,51 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import AuditEvent
+from app.search import apply_ranking, apply_search, build_match_query, id_column
+
+
+def test_build_match_query():
+    assert build_match_query("python3") == '("python3")'
+    assert build_match_query("pyth*") == '("pyth"*)'
+    assert build_match_query("python3 nc") == '("python3" AND "nc")'
+    assert build_match_query("python3 | nc OR vim") == '("python3") OR ("nc") OR ("vim")'
+    assert build_match_query("/usr/bin/vim") == '("usr bin vim")'
+    assert build_match_query("/usr/bin/py*") == '("usr bin py"*)'
+    assert build_match_query('  "" ') is None
+
+
+def _engine(make_db, exes):
+    return make_db([
+        {"exe": exe, "comm": exe.rsplit("/", 1)[1], "classification": "normal",
+         "reason": f"exe={exe}"}
+        for exe in exes
+    ])
+
+
+def _search_page(session, text, before_id=None, size=2):
+    stmt, searching = apply_search(select(AuditEvent), text)
+    id_col = id_column(searching)
+    if before_id is not None:
+        stmt = stmt.where(id_col < before_id)
+    return session.scalars(stmt.order_by(id_col.desc()).limit(size)).all()
+
+
+def test_search_newest_first_with_keyset(make_db):
+    engine = _engine(make_db, ["/usr/bin/nc", "/usr/bin/cat", "/usr/bin/nc",
+                                "/usr/bin/python3", "/usr/bin/nc"])
+    with Session(engine) as session:
+        page1 = _search_page(session, "nc")
+        page2 = _search_page(session, "nc", before_id=page1[-1].id)
+        assert [e.id for e in page1] == [5, 3]
+        assert [e.id for e in page2] == [1]
+        assert _search_page(session, "python") == []
+        assert [e.exe for e in _search_page(session, "python*")] == ["/usr/bin/python3"]
+
+
+def test_ranking_limited_to_newest_candidates(make_db):
+    engine = _engine(make_db, ["/usr/bin/nc"] * 5)
+    with Session(engine) as session:
+        stmt, _ = apply_search(select(AuditEvent), "nc")
+        ranked = session.scalars(apply_ranking(stmt, "nc", candidates=3)).all()
+        assert sorted(e.id for e in ranked) == [3, 4, 5]